@@ -10,7 +10,8 @@ This FastAPI server is an MVP of sorts for Pipecat Cloud web clients. It has two
 - POST /connect: Point an RTVI-compatible frontend at this endpoint to connect to a bot.
 - GET /direct: Direct browser access to a bot via Daily Prebuilt.
 
-The API also serves anything in /public, so you can include simple web clients there.
+The API also serves anything in /static, so you can include simple web clients there. Set
+SERVE_STATIC=false to skip this when those files are served by a CDN or reverse proxy.
 
 Requirements:
 - Daily API key (set in .env file)
@@ -18,12 +19,17 @@ Requirements:
 - FastAPI
 """
 
+import asyncio
+import logging
+import logging.handlers
 import os
-from typing import Any, Dict
+import queue
+from contextlib import asynccontextmanager
 
-import aiohttp
+import httpx
+import orjson
 from dotenv import load_dotenv
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import RedirectResponse
 from fastapi.staticfiles import StaticFiles
@@ -31,45 +37,176 @@ from fastapi.staticfiles import StaticFiles
 # Load environment variables from .env file
 load_dotenv(override=True)
 
+PCC_API_KEY = os.environ["PCC_API_KEY"]
+PCC_BOT_START_URL = os.environ["PCC_BOT_START_URL"]
+
+_START_HEADERS = {
+    "Content-Type": "application/json",
+    "Authorization": f"Bearer {PCC_API_KEY}",
+}
+_START_PARAMS = {"createDailyRoom": True}
+
+# Upper bound on concurrent bot start requests to PCC; bursts beyond this queue here
+MAX_CONCURRENT_STARTS = 32
+
+# /connect calls carrying the same X-Session-Id within this window share one bot
+COALESCE_WINDOW_SECS = 2.0
+
+# Comma-separated list of allowed origins; defaults to any origin. An empty value
+# disables cross-origin access.
+CORS_ALLOW_ORIGINS = [
+    o.strip() for o in os.getenv("CORS_ALLOW_ORIGINS", "*").split(",") if o.strip()
+]
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that enqueues records unformatted.
+
+    The stock prepare() formats the message (and any traceback) on the calling thread;
+    here that is left to the listener thread, so route handlers only pay for the level
+    check and the enqueue.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+# Route handlers only enqueue log records; a background listener thread does the
+# message formatting and the blocking write to stderr.
+log = logging.getLogger(__name__)
+_log_queue: queue.Queue = queue.Queue(-1)
+log.addHandler(_DeferredQueueHandler(_log_queue))
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_handler)
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+if isinstance(logging.getLevelName(LOG_LEVEL), int):
+    log.setLevel(LOG_LEVEL)
+else:
+    log.setLevel(logging.INFO)
+    log.warning("Ignoring unknown LOG_LEVEL %r; using INFO", LOG_LEVEL)
+
+# Set to "false" when static/ is served by a CDN or reverse proxy instead
+_SERVE_STATIC_ENV = (os.getenv("SERVE_STATIC") or "true").strip().lower()
+if _SERVE_STATIC_ENV in ("1", "true", "yes", "on"):
+    SERVE_STATIC = True
+elif _SERVE_STATIC_ENV in ("0", "false", "no", "off"):
+    SERVE_STATIC = False
+else:
+    SERVE_STATIC = True
+    log.warning("Ignoring unknown SERVE_STATIC %r; serving static files", _SERVE_STATIC_ENV)
+
+# In-flight and just-finished bot starts, keyed by X-Session-Id
+_pending_starts: dict[str, asyncio.Task] = {}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Manage the shared HTTP client and log listener for the lifetime of the app."""
+    _log_listener.start()
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        timeout=httpx.Timeout(30.0, connect=5.0),
+        # httpx has no DNS cache of its own, so keep idle upstream connections around
+        # long enough that new connections (and their DNS lookups) stay rare.
+        limits=httpx.Limits(
+            max_keepalive_connections=MAX_CONCURRENT_STARTS,
+            max_connections=100,
+            keepalive_expiry=300.0,
+        ),
+        headers=_START_HEADERS,
+    )
+    app.state.start_sem = asyncio.Semaphore(MAX_CONCURRENT_STARTS)
+
+    # Open a connection to PCC up front so the first bot start skips the TLS handshake
+    try:
+        await app.state.http.options(PCC_BOT_START_URL, timeout=3.0)
+    except (httpx.HTTPError, httpx.InvalidURL) as e:
+        log.warning("Unable to pre-warm connection to PCC: %s", e)
+
+    try:
+        yield
+    finally:
+        await app.state.http.aclose()
+        _log_listener.stop()
+
 
 # Initialize FastAPI app with lifespan manager
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
-# Configure CORS to allow requests from any origin
+# Configure CORS for the configured origins and the only methods/headers the API uses.
+# Credentials are only allowed for an explicit origin list, never for the wildcard.
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=CORS_ALLOW_ORIGINS,
+    allow_credentials="*" not in CORS_ALLOW_ORIGINS,
+    allow_methods=["GET", "POST"],
+    # RTVI clients commonly send Authorization even though this server doesn't read it
+    allow_headers=["content-type", "authorization", "x-session-id"],
 )
 
 
-async def start_bot() -> tuple[str, str]:
+async def start_bot(client: httpx.AsyncClient, sem: asyncio.Semaphore) -> tuple[str, str]:
     """Start a bot process."""
-    aiohttp_session = aiohttp.ClientSession()
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {os.getenv('PCC_API_KEY')}",
-    }
-    params = {"createDailyRoom": True}
-    async with aiohttp_session.post(
-        os.getenv("PCC_BOT_START_URL"), headers=headers, json=params
-    ) as r:
-        if r.status != 200:
-            text = await r.text()
-            raise Exception(f"Unable to create room (status: {r.status}): {text}")
-
-        data = await r.json()
+    # Upstream failures are logged in full but reported to the client as a bare
+    # 502/504, since they come from this server's PCC configuration, not the caller.
+    try:
+        async with sem:
+            r = await client.post(PCC_BOT_START_URL, json=_START_PARAMS)
+    except httpx.TimeoutException as e:
+        log.error("Timed out starting bot: %r", e)
+        raise HTTPException(504, "Timed out creating room")
+    except httpx.HTTPError as e:
+        log.error("Unable to reach PCC: %r", e)
+        raise HTTPException(502, "Unable to create room")
+
+    if not r.is_success:
+        log.error("Unable to create room (status: %s): %s", r.status_code, r.text)
+        raise HTTPException(502, "Unable to create room")
+
+    # Don't log the body here: a partial success response can still carry the token
+    try:
+        data = orjson.loads(r.content)
+    except orjson.JSONDecodeError:
+        log.error("Unparseable response from PCC (status: %s)", r.status_code)
+        raise HTTPException(502, "Unable to create room")
+    try:
         room_url = data["dailyRoom"]
         token = data["dailyToken"]
-        await aiohttp_session.close()
-    print(f"Returning room: {room_url} and token: {token}")
+    except (KeyError, TypeError):
+        keys = sorted(data) if isinstance(data, dict) else type(data).__name__
+        log.error("Unexpected response from PCC (status: %s, keys: %s)", r.status_code, keys)
+        raise HTTPException(502, "Unable to create room")
+    log.debug("Returning room: %s", room_url)
     return (room_url, token)
 
 
-@app.get("/direct")
-async def start_agent(request: Request):
+def _forget_start(key: str, task: asyncio.Task):
+    """Drop a finished start from the coalescing cache.
+
+    Failed starts are dropped immediately so the next call retries; successful ones
+    are kept for COALESCE_WINDOW_SECS so reconnect bursts reuse the same room.
+    """
+    if task.cancelled() or task.exception() is not None:
+        _pending_starts.pop(key, None)
+    else:
+        asyncio.get_running_loop().call_later(COALESCE_WINDOW_SECS, _pending_starts.pop, key, None)
+
+
+async def start_bot_coalesced(key: str) -> tuple[str, str]:
+    """Start a bot, sharing the result with other recent calls for the same key."""
+    task = _pending_starts.get(key)
+    if task is None:
+        task = asyncio.create_task(start_bot(app.state.http, app.state.start_sem))
+        _pending_starts[key] = task
+        task.add_done_callback(lambda t: _forget_start(key, t))
+    # Shield so one caller disconnecting doesn't cancel the start for the others
+    return await asyncio.shield(task)
+
+
+@app.get("/direct", response_class=RedirectResponse)
+async def start_agent():
     """Endpoint for direct browser access to the bot.
 
     Creates a room, starts a bot instance, and redirects to the Daily room URL.
@@ -81,27 +218,55 @@ async def start_agent(request: Request):
         HTTPException: If room creation, token generation, or bot startup fails
     """
 
-    room_url, token = await start_bot()
-    return RedirectResponse(room_url)
+    room_url, token = await start_bot(app.state.http, app.state.start_sem)
+    # Each redirect points at a freshly created room, so it must never be cached
+    return RedirectResponse(url=room_url, status_code=307, headers={"cache-control": "no-store"})
 
 
 @app.post("/connect")
-async def rtvi_connect(request: Request) -> Dict[Any, Any]:
+async def rtvi_connect(request: Request) -> dict[str, str]:
     """RTVI connect endpoint that creates a room and returns connection credentials.
 
-    This endpoint is called by RTVI clients to establish a connection.
+    This endpoint is called by RTVI clients to establish a connection. Repeated calls
+    carrying the same X-Session-Id header within COALESCE_WINDOW_SECS reuse the same room
+    instead of starting another bot. Calls without the header always get their own bot.
+
+    Any caller presenting the same X-Session-Id in that window gets the same room URL
+    and token, so clients must generate unguessable values (e.g. a random UUID).
 
     Returns:
-        Dict[Any, Any]: Authentication bundle containing room_url and token
+        dict[str, str]: Authentication bundle containing room_url and token
 
     Raises:
         HTTPException: If room creation, token generation, or bot startup fails
     """
 
-    room_url, token = await start_bot()
+    session_id = request.headers.get("x-session-id")
+    if session_id:
+        room_url, token = await start_bot_coalesced(session_id)
+    else:
+        room_url, token = await start_bot(app.state.http, app.state.start_sem)
 
     # Return the authentication bundle in format expected by DailyTransport
     return {"room_url": room_url, "token": token}
 
 
-app.mount("/", StaticFiles(directory="static", html=True), name="static")
+if SERVE_STATIC:
+    app.mount("/", StaticFiles(directory="static", html=True), name="static")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # Each worker is a separate process with its own HTTP client, log listener, and
+    # /connect coalescing cache; a burst split across workers may start extra bots.
+    uvicorn.run(
+        "main:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8000")),
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+        # "auto" picks uvloop/httptools when installed (via fastapi[all]), which they
+        # aren't on Windows
+        loop="auto",
+        http="auto",
+    )
@@ -0,0 +1,5 @@
+import os
+
+# main.py reads these at import time
+os.environ.setdefault("PCC_API_KEY", "pk_test")
+os.environ.setdefault("PCC_BOT_START_URL", "http://pcc.invalid/start")
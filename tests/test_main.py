@@ -0,0 +1,177 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import main
+
+
+@pytest.fixture
+def starts(monkeypatch):
+    """Replace start_bot with a fake that hands out a new room on every call."""
+    calls = []
+
+    async def fake_start_bot(client, sem):
+        calls.append(None)
+        n = len(calls)
+        await asyncio.sleep(0.01)
+        return (f"https://example.daily.co/room{n}", f"token{n}")
+
+    monkeypatch.setattr(main, "start_bot", fake_start_bot)
+    # The fake ignores these, but the handlers read them from app state
+    monkeypatch.setattr(main.app.state, "http", None, raising=False)
+    monkeypatch.setattr(main.app.state, "start_sem", None, raising=False)
+    main._pending_starts.clear()
+    yield calls
+    main._pending_starts.clear()
+
+
+def test_same_key_shares_one_start(starts):
+    async def run():
+        return await asyncio.gather(
+            main.start_bot_coalesced("session-a"), main.start_bot_coalesced("session-a")
+        )
+
+    first, second = asyncio.run(run())
+    assert first == second
+    assert len(starts) == 1
+
+
+def test_different_key_gets_its_own_start(starts):
+    async def run():
+        return await asyncio.gather(
+            main.start_bot_coalesced("session-a"), main.start_bot_coalesced("session-b")
+        )
+
+    first, second = asyncio.run(run())
+    assert first != second
+    assert len(starts) == 2
+
+
+def test_failed_start_is_retried(starts, monkeypatch):
+    succeed = main.start_bot
+
+    async def fail_once(client, sem):
+        monkeypatch.setattr(main, "start_bot", succeed)
+        raise HTTPException(502, "Unable to create room")
+
+    monkeypatch.setattr(main, "start_bot", fail_once)
+
+    async def run():
+        with pytest.raises(HTTPException):
+            await main.start_bot_coalesced("session-a")
+        return await main.start_bot_coalesced("session-a")
+
+    assert asyncio.run(run()) == ("https://example.daily.co/room1", "token1")
+    assert len(starts) == 1
+
+
+def test_connect_without_session_id_never_coalesces(starts):
+    client = TestClient(main.app)
+    first = client.post("/connect").json()
+    second = client.post("/connect").json()
+    assert first["room_url"] != second["room_url"]
+    assert first["token"] != second["token"]
+    assert len(starts) == 2
+
+
+def test_connect_with_session_id_reuses_room(starts):
+    client = TestClient(main.app)
+    first = client.post("/connect", headers={"X-Session-Id": "abc"}).json()
+    second = client.post("/connect", headers={"X-Session-Id": "abc"}).json()
+    other = client.post("/connect", headers={"X-Session-Id": "xyz"}).json()
+    assert first == second
+    assert other != first
+    assert len(starts) == 2
+
+
+def test_connect_preflight_allows_rtvi_headers():
+    client = TestClient(main.app)
+    r = client.options(
+        "/connect",
+        headers={
+            "Origin": "https://client.example",
+            "Access-Control-Request-Method": "POST",
+            "Access-Control-Request-Headers": "content-type, authorization, x-session-id",
+        },
+    )
+    assert r.status_code == 200
+    assert r.headers["access-control-allow-origin"] == "*"
+
+
+def test_connect_preflight_rejects_other_headers():
+    client = TestClient(main.app)
+    r = client.options(
+        "/connect",
+        headers={
+            "Origin": "https://client.example",
+            "Access-Control-Request-Method": "POST",
+            "Access-Control-Request-Headers": "x-custom",
+        },
+    )
+    assert r.status_code == 400
+
+
+def _start_bot_with(handler):
+    """Run the real start_bot against a mocked PCC endpoint."""
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await main.start_bot(client, asyncio.Semaphore(1))
+
+    return asyncio.run(run())
+
+
+def test_start_bot_returns_room_and_token():
+    def handler(request):
+        return httpx.Response(
+            200, json={"dailyRoom": "https://example.daily.co/r", "dailyToken": "t"}
+        )
+
+    assert _start_bot_with(handler) == ("https://example.daily.co/r", "t")
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        httpx.Response(500, text="upstream broke"),
+        httpx.Response(401, text="bad key"),
+        httpx.Response(302, headers={"location": "https://elsewhere.example"}),
+        httpx.Response(200, text="<html>not json</html>"),
+        httpx.Response(200, json={"dailyToken": "secret"}),
+        httpx.Response(200, json=["not", "a", "dict"]),
+    ],
+    ids=["500", "401", "302", "non-json", "missing-key", "not-a-dict"],
+)
+def test_start_bot_maps_bad_upstream_responses_to_502(response):
+    with pytest.raises(HTTPException) as exc_info:
+        _start_bot_with(lambda request: response)
+    assert exc_info.value.status_code == 502
+    assert exc_info.value.detail == "Unable to create room"
+
+
+def test_start_bot_maps_timeout_to_504():
+    def handler(request):
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    with pytest.raises(HTTPException) as exc_info:
+        _start_bot_with(handler)
+    assert exc_info.value.status_code == 504
+
+
+def test_start_bot_maps_connect_error_to_502():
+    def handler(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    with pytest.raises(HTTPException) as exc_info:
+        _start_bot_with(handler)
+    assert exc_info.value.status_code == 502
+
+
+def test_startup_survives_invalid_start_url(monkeypatch):
+    monkeypatch.setattr(main, "PCC_BOT_START_URL", "http://[::1")
+    with TestClient(main.app):
+        assert not main.app.state.http.is_closed
+    assert main.app.state.http.is_closed